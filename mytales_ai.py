@@ -10,8 +10,9 @@
 #  2) call_gpt_story()가 rationale/cdps_code를 받아 기존 PROMPT 뒤에 [검사 근거] 블록을 추가
 #  3) /generate-story 가 payload.cdps(domain_avg, code 등)을 받아 프롬프트에 반영하고
 #     응답에 story.meta.rationale / meta.focus_domains를 포함
+#  4) 요청 단계별 소요시간을 Server-Timing 헤더로 반환 + 선택적 cProfile 프로파일링 훅
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, has_request_context
 from flask_cors import CORS
 from openai import OpenAI
 from dotenv import load_dotenv
@@ -20,6 +21,11 @@ import time
 import logging
 import json
 import re
+import random
+import threading
+import uuid
+import cProfile
+from contextlib import contextmanager
 
 # ─────────────────────────────────
 # 환경 설정 / 로깅
@@ -39,7 +45,7 @@ CORS(
     resources={r"/*": {"origins": "*"}},
     supports_credentials=False,
     allow_headers=["Content-Type", "Authorization"],
-    expose_headers=["Content-Type"],
+    expose_headers=["Content-Type", "Server-Timing"],
     methods=["GET", "POST", "OPTIONS"],
 )
 
@@ -50,6 +56,113 @@ logging.basicConfig(
 logger = logging.getLogger("mytales")
 
 
+# ─────────────────────────────────
+# 단계별 타이밍 (Server-Timing) / 프로파일링 훅
+# ─────────────────────────────────
+# PROFILE_SAMPLE_RATE : 0~1, 이 비율만큼의 요청을 무작위로 프로파일링 (기본 0 = 끔)
+# PROFILE_ALLOW_HEADER: "1"이면 요청 헤더 X-MyTales-Profile: 1 로도 프로파일링 허용
+# PROFILE_DIR         : 요청별 .prof 파일을 쓰는 로컬 디렉터리
+#
+# cProfile 은 프로세스 전역 훅이라(3.12+ 는 sys.monitoring 기반) 동시에 하나만 켤 수 있고,
+# 켜져 있는 동안 다른 스레드의 호출도 함께 기록된다. 그래서 한 번에 한 요청만 프로파일링하고
+# (_PROFILE_LOCK), 이미 다른 요청이 프로파일링 중이면 이번 요청은 조용히 건너뛴다.
+# threaded 서버에서는 .prof 안에 동시에 돌던 다른 요청의 작업이 섞일 수 있다는 점에 주의.
+def _read_sample_rate():
+    raw = os.getenv("PROFILE_SAMPLE_RATE", "0") or "0"
+    try:
+        rate = float(raw)
+    except ValueError:
+        logger.warning(f"[profile] invalid PROFILE_SAMPLE_RATE={raw!r}. profiling by sample disabled")
+        return 0.0
+    return min(max(rate, 0.0), 1.0)
+
+
+PROFILE_SAMPLE_RATE = _read_sample_rate()
+PROFILE_ALLOW_HEADER = os.getenv("PROFILE_ALLOW_HEADER", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_HEADER = "X-MyTales-Profile"
+_PROFILE_LOCK = threading.Lock()
+
+
+@contextmanager
+def timed_phase(name):
+    """
+    with 블록 소요시간(ms)을 현재 요청의 g.timings[name]에 누적.
+    재시도처럼 같은 단계가 여러 번 돌면 합산된다. 요청 밖에서는 아무것도 안 함.
+    """
+    start_t = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context():
+            took_ms = (time.perf_counter() - start_t) * 1000
+            timings = g.setdefault("timings", {})
+            timings[name] = timings.get(name, 0.0) + took_ms
+
+
+def _should_profile():
+    if PROFILE_ALLOW_HEADER and request.headers.get(PROFILE_HEADER) == "1":
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+@app.before_request
+def _start_request_timing():
+    g.request_start = time.perf_counter()
+    g.timings = {}
+    g.profiler = None
+    if request.method != "OPTIONS" and _should_profile():
+        if not _PROFILE_LOCK.acquire(blocking=False):
+            logger.info("[profile] another request is being profiled. skip")
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # 디버거 등 다른 프로파일링 도구가 이미 켜져 있으면 요청은 그대로 진행
+            _PROFILE_LOCK.release()
+            logger.warning(f"[profile] enable fail: {e}")
+            return
+        g.profiler = profiler
+
+
+def _stop_profiler(profiler):
+    profiler.disable()
+    _PROFILE_LOCK.release()
+
+
+@app.after_request
+def _add_server_timing(response):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        _stop_profiler(profiler)
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            endpoint = (request.endpoint or "unknown").replace("/", "_")
+            fname = f"{endpoint}-{int(time.time() * 1000)}-{os.getpid()}-{uuid.uuid4().hex[:8]}.prof"
+            path = os.path.join(PROFILE_DIR, fname)
+            profiler.dump_stats(path)
+            logger.info(f"[profile] wrote {path}")
+        except OSError as e:
+            logger.warning(f"[profile] dump fail: {e}")
+
+    start_t = g.get("request_start")
+    if start_t is None:
+        return response
+    parts = [f"{k};dur={v:.1f}" for k, v in g.get("timings", {}).items()]
+    parts.append(f"total;dur={(time.perf_counter() - start_t) * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(parts)
+    return response
+
+
+@app.teardown_request
+def _release_profiler(exc):
+    # after_request 가 건너뛰어진 경우에도 프로파일러가 켜진 채로 남지 않게
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        _stop_profiler(profiler)
+
+
 # ─────────────────────────────────
 # 금지 결말 패턴
 # (완벽히 해결/교정 선언형 엔딩 차단)
@@ -389,31 +502,37 @@ def call_gpt_story(name, age, gender_norm, goal, cdps_code=None, rationale_text=
     JSON 파싱 실패하면 fallback.
     """
     last_result_text = None
-    assessment_block = build_assessment_block(cdps_code, focus_keys, rationale_text)
+    with timed_phase("prompt"):
+        assessment_block = build_assessment_block(cdps_code, focus_keys, rationale_text)
 
     for attempt in range(max_retries):
         start_t = time.time()
 
-        prompt = (
-            PROMPT_HEADER.format(name=name, age=age, gender=gender_norm, goal=goal)
-            + "\n"
-            + assessment_block
-            + "\n"
-            + PROMPT_FOOTER
-        )
-
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.7,
-            max_tokens=2000,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        with timed_phase("prompt"):
+            prompt = (
+                PROMPT_HEADER.format(name=name, age=age, gender=gender_norm, goal=goal)
+                + "\n"
+                + assessment_block
+                + "\n"
+                + PROMPT_FOOTER
+            )
+
+        with timed_phase("upstream"):
+            resp = client.chat.completions.create(
+                model="gpt-4o-mini",
+                temperature=0.7,
+                max_tokens=2000,
+                messages=[{"role": "user", "content": prompt}]
+            )
 
         raw_text = (resp.choices[0].message.content or "").strip()
         took = round(time.time() - start_t, 2)
         logger.info(f"[call_gpt_story] try={attempt+1} took={took}s chars={len(raw_text)}")
 
-        if not violates_banned_resolution(raw_text):
+        with timed_phase("banned"):
+            banned = violates_banned_resolution(raw_text)
+
+        if not banned:
             last_result_text = raw_text
             break
         else:
@@ -421,7 +540,8 @@ def call_gpt_story(name, age, gender_norm, goal, cdps_code=None, rationale_text=
             last_result_text = raw_text
 
     try:
-        parsed = json.loads(last_result_text)
+        with timed_phase("parse"):
+            parsed = json.loads(last_result_text)
     except Exception as e:
         logger.warning(f"[call_gpt_story] JSON parse fail: {e}")
         parsed = {
@@ -444,9 +564,9 @@ def call_gpt_story(name, age, gender_norm, goal, cdps_code=None, rationale_text=
 # ─────────────────────────────────
 # 이미지 생성 (변경 없음)
 # ─────────────────────────────────
-def call_image_generation(image_guide, must_keep, global_visual, scene_text):
+def build_image_prompt(image_guide, must_keep, global_visual, scene_text):
     """
-    한 장면 이미지를 생성해서 data URL 또는 직접 URL로 반환.
+    must_keep > global_visual 순으로 비주얼 정보를 골라 단일 컷 프롬프트 생성.
     """
     hair = (must_keep.get("hair") or global_visual.get("hair") or "")
     outfit = (must_keep.get("outfit") or global_visual.get("outfit") or "")
@@ -473,16 +593,26 @@ def call_image_generation(image_guide, must_keep, global_visual, scene_text):
         "natural healthy child body proportions. "
         "no fear. no violence. no scary elements."
     )
+    return full_prompt
+
+
+def call_image_generation(image_guide, must_keep, global_visual, scene_text):
+    """
+    한 장면 이미지를 생성해서 data URL 또는 직접 URL로 반환.
+    """
+    with timed_phase("prompt"):
+        full_prompt = build_image_prompt(image_guide, must_keep, global_visual, scene_text)
 
     start_t = time.time()
-    img_resp = client.images.generate(
-        model="dall-e-3",
-        prompt=full_prompt,
-        size="1024x1024",
-        quality="standard",
-        n=1,
-        response_format="b64_json",  # base64 직접 받기
-    )
+    with timed_phase("upstream"):
+        img_resp = client.images.generate(
+            model="dall-e-3",
+            prompt=full_prompt,
+            size="1024x1024",
+            quality="standard",
+            n=1,
+            response_format="b64_json",  # base64 직접 받기
+        )
     took = round(time.time() - start_t, 2)
     logger.info(f"[call_image_generation] took={took}s")
 
@@ -604,7 +734,8 @@ def generate_story():
     story_dict["meta"]["rationale"] = rationale or ""
     story_dict["meta"]["focus_domains"] = focus_keys or []
 
-    return jsonify(story_dict)
+    with timed_phase("respond"):
+        return jsonify(story_dict)
 
 
 # ─────────────────────────────────
@@ -639,7 +770,8 @@ def generate_image():
     if not img_data_url:
         return jsonify({"image_data_url": None}), 500
 
-    return jsonify({"image_data_url": img_data_url})
+    with timed_phase("respond"):
+        return jsonify({"image_data_url": img_data_url})
 
 
 # ─────────────────────────────────